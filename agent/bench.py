@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from .config import RESCORE_FACTOR, VECTOR_DIR
+from .store import DTYPES, VectorStore, load_index, load_store, quantize, shard_dir
+
+
+def _full_matrix(store: VectorStore) -> np.ndarray:
+	if store.dtype == "float32":
+		return np.asarray(store.codes, dtype=np.float32)
+	if store.full is not None:
+		return np.asarray(store.full, dtype=np.float32)
+	raise RuntimeError("Benchmark needs full-precision embeddings; re-ingest with EMBEDDING_DTYPE=float32 or RESCORE_FACTOR > 0")
+
+
+def _corpus_matrix(root: Path) -> np.ndarray:
+	"""Full-precision rows of every shard, stacked as one corpus"""
+	matrices = []
+	for shard_id in load_index(root):
+		store = load_store(shard_dir(root, shard_id))
+		if store is not None:
+			matrices.append(_full_matrix(store))
+	if not matrices:
+		raise FileNotFoundError(f"No vector store found in {root}; run ingestion first")
+	return np.concatenate(matrices)
+
+
+def _peak_search_bytes(store: VectorStore, query: np.ndarray, k: int, rescore: int) -> int:
+	"""Peak memory allocated by one search, on top of the stored matrix"""
+	tracemalloc.start()
+	try:
+		store.search(query, k, rescore=rescore)
+		return tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+
+
+def benchmark_quantization(k: int = 10, rescore: int = RESCORE_FACTOR, sample: int = 200, directory: Path = VECTOR_DIR, seed: int = 0) -> List[Dict[str, Any]]:
+	"""Measure recall@k, at-rest size and peak query memory of each embedding dtype against exact float32 search.
+
+	Stored chunk embeddings are reused as queries (no API calls); each query's own
+	row is excluded so the trivial self-match does not inflate recall.
+	"""
+	matrix = _corpus_matrix(directory)
+	if len(matrix) < 2:
+		raise RuntimeError("Benchmark needs at least two stored chunks")
+
+	rng = np.random.default_rng(seed)
+	queries = rng.choice(len(matrix), size=min(sample, len(matrix)), replace=False)
+	exact = VectorStore(codes=matrix)
+
+	def top(s: VectorStore, row: int, r: int) -> List[int]:
+		hits = [i for _, i in s.search(matrix[row], k + 1, rescore=r) if i != row]
+		return hits[:k]
+
+	truth = {row: set(top(exact, row, 0)) for row in queries}
+
+	modes = []
+	for dtype in DTYPES:
+		modes.append((dtype, dtype, 0))
+		if dtype != "float32" and rescore > 0:
+			modes.append((f"{dtype}+rescore", dtype, rescore))
+
+	report = []
+	for name, dtype, r in modes:
+		codes, scales = quantize(matrix, dtype)
+		candidate = VectorStore(codes=codes, scales=scales, full=matrix if r else None)
+		recall = np.mean([len(truth[row] & set(top(candidate, row, r))) / max(len(truth[row]), 1) for row in queries])
+		report.append({
+			"mode": name,
+			"recall": float(recall),
+			"memory_bytes": candidate.nbytes,
+			"peak_scoring_bytes": _peak_search_bytes(candidate, matrix[queries[0]], k, r),
+			# Rescoring reads full-precision rows from a memory-mapped file on disk
+			"disk_bytes": candidate.nbytes + (matrix.nbytes if r else 0),
+		})
+	return report
+
+
+def format_report(report: List[Dict[str, Any]], k: int = 10) -> str:
+	lines = [f"{'mode':<18}{f'recall@{k}':>12}{'at rest':>12}{'peak query':>12}{'disk':>12}"]
+	for row in report:
+		lines.append(
+			f"{row['mode']:<18}{row['recall']:>12.3f}"
+			f"{row['memory_bytes'] / 1024:>10.1f}KB{row['peak_scoring_bytes'] / 1024:>10.1f}KB"
+			f"{row['disk_bytes'] / 1024:>10.1f}KB"
+		)
+	return "\n".join(lines)
+
+
+__all__ = ["benchmark_quantization", "format_report"]
@@ -16,8 +16,12 @@ def get_env_var(key: str, default: str | None = None) -> str:
 ROOT_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = ROOT_DIR / "data"
 VECTOR_DIR = ROOT_DIR / ".vectorstore"
+SPILL_DIR = ROOT_DIR / ".chat_spill"
 
-DOC_PATH = Path(os.getenv("DOC_PATH", DATA_DIR / "Corpus.pdf"))
+# A single document or a directory of documents (.pdf, .txt, .md), one shard each
+DOC_PATH = Path(os.getenv("DOC_PATH", DATA_DIR))
+# Shard IDs, sources and doc types are relative to this directory
+CORPUS_ROOT = DOC_PATH if DOC_PATH.is_dir() else DATA_DIR
 DEFAULT_CITY = os.getenv("DEFAULT_CITY", "Napa, CA")
 TIMEZONE = os.getenv("TZ", "America/Los_Angeles")
 
@@ -25,6 +29,22 @@ TIMEZONE = os.getenv("TZ", "America/Los_Angeles")
 MODEL_NAME = os.getenv("MODEL_NAME", "gemini-2.0-flash")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-004")
 
+# Vector store: embedding matrix dtype (float32, float16, int8) and the
+# shortlist multiplier for exact float32 rescoring (0 disables rescoring)
+EMBEDDING_DTYPE = os.getenv("EMBEDDING_DTYPE", "float16")
+RESCORE_FACTOR = int(os.getenv("RESCORE_FACTOR", "4"))
+
+# Chat UI: turns rendered per page of history, and the largest metadata
+# payload (bytes of JSON) kept in session state before spilling to disk
+CHAT_WINDOW_TURNS = int(os.getenv("CHAT_WINDOW_TURNS", "10"))
+METADATA_MAX_BYTES = int(os.getenv("METADATA_MAX_BYTES", "16384"))
+# Spill directories of past sessions are removed after this many hours, and
+# oldest-first once all of them together exceed the size cap. Sessions seen
+# within the grace period (every rerun touches its directory) are never removed
+SPILL_TTL_HOURS = float(os.getenv("SPILL_TTL_HOURS", "24"))
+SPILL_MAX_BYTES = int(os.getenv("SPILL_MAX_BYTES", str(256 * 1024 * 1024)))
+SPILL_GRACE_MINUTES = float(os.getenv("SPILL_GRACE_MINUTES", "30"))
+
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "")
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY", "")
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY", "")
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .config import METADATA_MAX_BYTES, SPILL_DIR, SPILL_GRACE_MINUTES, SPILL_MAX_BYTES, SPILL_TTL_HOURS
+
+
+def store_metadata(metadata: Dict[str, Any], session_id: str, max_bytes: int = METADATA_MAX_BYTES) -> Dict[str, Any]:
+	"""Keep small metadata inline; spill larger payloads to disk and keep a reference.
+
+	The returned dict is what goes into session state; spilled payloads are read
+	back with load_metadata only when their details are opened. Both paths go
+	through the same JSON round trip, so details look the same whatever the size.
+	"""
+	payload = json.dumps(metadata, ensure_ascii=False, default=str)
+	if len(payload.encode("utf-8")) <= max_bytes:
+		return json.loads(payload)
+
+	session_dir = SPILL_DIR / session_id
+	session_dir.mkdir(parents=True, exist_ok=True)
+	path = session_dir / f"{uuid.uuid4().hex}.json"
+	path.write_text(payload, encoding="utf-8")
+	return {"spilled": str(path)}
+
+
+def load_metadata(stored: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+	"""Inverse of store_metadata; None when the spill file has been pruned"""
+	if "spilled" not in stored:
+		return stored
+	try:
+		with open(stored["spilled"], "r", encoding="utf-8") as f:
+			return json.load(f)
+	except FileNotFoundError:
+		return None
+
+
+def touch_spill(session_id: str) -> None:
+	"""Heartbeat: mark the session's spill directory as in use"""
+	session_dir = SPILL_DIR / session_id
+	if session_dir.exists():
+		os.utime(session_dir)
+
+
+def clear_spill(session_id: str) -> None:
+	shutil.rmtree(SPILL_DIR / session_id, ignore_errors=True)
+
+
+def history_window(messages: List[Dict[str, Any]], turns: int) -> int:
+	"""Index of the first message to render so that the last `turns` user turns are shown"""
+	seen = 0
+	for i in range(len(messages) - 1, -1, -1):
+		if messages[i]["role"] == "user":
+			seen += 1
+			if seen == turns:
+				return i
+	return 0
+
+
+def _dir_size(path: Path) -> int:
+	return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def prune_spill(
+	keep: str | None = None,
+	ttl_hours: float = SPILL_TTL_HOURS,
+	max_bytes: int = SPILL_MAX_BYTES,
+	grace_minutes: float = SPILL_GRACE_MINUTES,
+) -> None:
+	"""Remove spill directories left behind by sessions that ended without Clear Chat.
+
+	Directories untouched for `ttl_hours` are deleted, then the oldest ones until
+	the total fits in `max_bytes`. The `keep` session and any directory touched
+	within `grace_minutes` (a session that is still open) are never removed.
+	"""
+	if not SPILL_DIR.exists():
+		return
+	sessions = sorted(
+		(d for d in SPILL_DIR.iterdir() if d.is_dir() and d.name != keep),
+		key=lambda d: d.stat().st_mtime,
+	)
+	now = time.time()
+	cutoff = now - ttl_hours * 3600
+	grace = now - grace_minutes * 60
+	remaining = []
+	for session_dir in sessions:
+		mtime = session_dir.stat().st_mtime
+		if mtime < cutoff:
+			shutil.rmtree(session_dir, ignore_errors=True)
+		else:
+			remaining.append((session_dir, mtime, _dir_size(session_dir)))
+
+	total = sum(size for _, _, size in remaining)
+	if keep:
+		total += _dir_size(SPILL_DIR / keep) if (SPILL_DIR / keep).exists() else 0
+	# Oldest first; stop at the first session that is still active
+	for session_dir, mtime, size in remaining:
+		if total <= max_bytes or mtime >= grace:
+			break
+		shutil.rmtree(session_dir, ignore_errors=True)
+		total -= size
+
+
+__all__ = ["store_metadata", "load_metadata", "touch_spill", "clear_spill", "prune_spill", "history_window"]
@@ -1,24 +1,44 @@
 from __future__ import annotations
 
-import json
-import pickle
+import hashlib
+import re
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Iterable, List, Dict, Any
+from typing import Iterable, List, Optional
 
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
+from langchain_community.document_loaders import PyPDFLoader, TextLoader
 
 from .config import (
+	CORPUS_ROOT,
 	DOC_PATH,
+	EMBEDDING_DTYPE,
 	EMBEDDING_MODEL,
 	GOOGLE_API_KEY,
+	RESCORE_FACTOR,
 	VECTOR_DIR,
 )
+from .store import (
+	check_dtype,
+	load_index,
+	remove_flat_store,
+	remove_shard,
+	requantize_shard,
+	save_shard,
+	shard_is_current,
+)
+
+
+LOADERS = {
+	".pdf": PyPDFLoader,
+	".txt": TextLoader,
+	".md": TextLoader,
+}
 
 
-def load_pdf(path: Path) -> List:
-	loader = PyPDFLoader(str(path))
+def load_document(path: Path) -> List:
+	loader = LOADERS[path.suffix.lower()](str(path))
 	return loader.load()
 
 
@@ -37,38 +57,140 @@ def build_embeddings() -> GoogleGenerativeAIEmbeddings:
 	return GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)
 
 
-def ingest_pdf_to_chroma(pdf_path: Path | None = None) -> str:
-	path = Path(pdf_path) if pdf_path else DOC_PATH
-	if not path.exists():
-		raise FileNotFoundError(f"Document not found: {path}")
+def discover_documents(path: Path) -> List[Path]:
+	if path.is_file():
+		return [path]
+	return sorted(p for p in path.rglob("*") if p.is_file() and p.suffix.lower() in LOADERS)
+
+
+def relative_source(path: Path) -> Path:
+	"""Document path relative to the corpus root; documents outside it are keyed by file name"""
+	try:
+		return Path(path).resolve().relative_to(CORPUS_ROOT.resolve())
+	except ValueError:
+		return Path(Path(path).name)
+
+
+def shard_id_for(relative: Path) -> str:
+	"""Stable shard name for a corpus-relative path, e.g. tech_sheets/Cab.pdf -> tech-sheets-cab-pdf-<hash>
+
+	The hash keeps paths that slugify the same (Cab Sauv.pdf, cab-sauv.pdf) apart.
+	"""
+	slug = re.sub(r"[^a-z0-9]+", "-", relative.as_posix().lower()).strip("-")
+	digest = hashlib.sha1(relative.as_posix().encode("utf-8")).hexdigest()[:8]
+	return f"{slug}-{digest}"
 
-	documents = load_pdf(path)
-	chunks = chunk_documents(documents)
-	embeddings = build_embeddings()
+
+def _doc_type(relative: Path) -> str:
+	# Documents in a subfolder take its name as doc type, top-level ones their extension
+	if len(relative.parts) > 1:
+		return relative.parts[0]
+	return relative.suffix.lstrip(".").lower()
+
+
+def ingest_document(
+	path: Path,
+	doc_type: Optional[str] = None,
+	embeddings: Optional[GoogleGenerativeAIEmbeddings] = None,
+) -> int:
+	"""Chunk, embed and (re)write the shard for a single document"""
+	check_dtype(EMBEDDING_DTYPE)
+	path = Path(path)
+	relative = relative_source(path)
+	shard_id = shard_id_for(relative)
+
+	chunks = chunk_documents(load_document(path))
+	if not chunks:
+		# Drop any previous shard so its stale text is no longer retrieved
+		print(f"Skipping {relative}: no text found")
+		remove_shard(VECTOR_DIR, shard_id)
+		return 0
+	embeddings = embeddings or build_embeddings()
 
 	# Create embeddings for all chunks
-	print("Creating embeddings...")
+	print(f"Creating embeddings for {relative}...")
 	chunk_texts = [chunk.page_content for chunk in chunks]
 	chunk_embeddings = embeddings.embed_documents(chunk_texts)
-	
+
 	# Prepare data for storage
 	chunk_data = []
-	for i, (chunk, embedding) in enumerate(zip(chunks, chunk_embeddings)):
+	for i, chunk in enumerate(chunks):
 		chunk_data.append({
 			"id": i,
 			"text": chunk.page_content,
 			"metadata": chunk.metadata,
-			"embedding": embedding
 		})
-	
-	# Save to disk as JSON (no async issues)
-	VECTOR_DIR.mkdir(exist_ok=True)
-	with open(VECTOR_DIR / "chunks.json", "w", encoding="utf-8") as f:
-		json.dump(chunk_data, f, indent=2, ensure_ascii=False)
-
-	return f"Ingested {len(chunks)} chunks into simple file storage"
 
+	pages = [chunk.metadata["page"] for chunk in chunks if "page" in chunk.metadata]
+	metadata = {
+		"source": relative.as_posix(),
+		"doc_type": doc_type or _doc_type(relative),
+		"pages": [min(pages), max(pages)] if pages else None,
+		"ingested_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+		"mtime": path.stat().st_mtime,
+	}
+
+	# Texts as JSON, embeddings as a compressed .npy matrix (no async issues)
+	save_shard(VECTOR_DIR, shard_id, chunk_data, chunk_embeddings, EMBEDDING_DTYPE, metadata, keep_full=RESCORE_FACTOR > 0)
+	return len(chunks)
+
+
+def ingest_corpus(path: Path | None = None, force: bool = False, doc_type: Optional[str] = None) -> str:
+	"""Ingest a document or a directory of documents, one shard per document.
+
+	Documents whose shard is already up to date (same modification time and
+	stored in the configured dtype) are skipped unless `force` is set. Unchanged
+	documents stored in another dtype are re-quantized from their float32 copy
+	when one exists, and re-embedded otherwise. Shards of documents under the scanned
+	directory that no longer exist are dropped. Shards elsewhere in the corpus
+	are left untouched, so a subfolder or single file can be re-ingested alone.
+	"""
+	check_dtype(EMBEDDING_DTYPE)
+	path = Path(path) if path else DOC_PATH
+	if not path.exists():
+		raise FileNotFoundError(f"Document not found: {path}")
 
-__all__ = ["ingest_pdf_to_chroma"]
+	documents = discover_documents(path)
+	if not documents:
+		raise FileNotFoundError(f"No supported documents ({', '.join(LOADERS)}) found in {path}")
+
+	index = load_index(VECTOR_DIR)
+	embeddings = None
+	seen = set()
+	keep_full = RESCORE_FACTOR > 0
+	ingested = skipped = requantized = empty = total = 0
+	for document in documents:
+		shard_id = shard_id_for(relative_source(document))
+		seen.add(shard_id)
+		if not force and index.get(shard_id, {}).get("mtime") == document.stat().st_mtime:
+			if shard_is_current(VECTOR_DIR, shard_id, EMBEDDING_DTYPE, keep_full):
+				skipped += 1
+				continue
+			if requantize_shard(VECTOR_DIR, shard_id, EMBEDDING_DTYPE, keep_full=keep_full):
+				requantized += 1
+				continue
+		embeddings = embeddings or build_embeddings()
+		count = ingest_document(document, doc_type=doc_type, embeddings=embeddings)
+		if count:
+			ingested += 1
+			total += count
+		else:
+			empty += 1
+
+	removed = 0
+	scanned = relative_source(path) if path.is_dir() else None
+	if scanned is not None and path.resolve().is_relative_to(CORPUS_ROOT.resolve()):
+		for shard_id, metadata in index.items():
+			if shard_id not in seen and Path(metadata.get("source", "")).is_relative_to(scanned):
+				remove_shard(VECTOR_DIR, shard_id)
+				removed += 1
+
+	remove_flat_store(VECTOR_DIR)
+
+	return (
+		f"Ingested {total} chunks from {ingested} document(s) into simple file storage ({EMBEDDING_DTYPE} embeddings); "
+		f"{skipped} unchanged, {requantized} re-quantized, {empty} empty, {removed} removed"
+	)
 
 
+__all__ = ["ingest_corpus", "ingest_document"]
@@ -1,53 +1,52 @@
 from __future__ import annotations
 
-import json
-import numpy as np
-from pathlib import Path
-from typing import List, Dict, Any
+from typing import Any, Dict, List, Optional
 
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_core.documents import Document
 
-from .config import EMBEDDING_MODEL, VECTOR_DIR
+from .config import EMBEDDING_MODEL, RESCORE_FACTOR, VECTOR_DIR
+from .store import load_index, load_store, select_shards, shard_dir
 
 
 def _embeddings() -> GoogleGenerativeAIEmbeddings:
 	return GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)
 
 
-def cosine_similarity(a: List[float], b: List[float]) -> float:
-	"""Calculate cosine similarity between two vectors"""
-	a_np = np.array(a)
-	b_np = np.array(b)
-	return np.dot(a_np, b_np) / (np.linalg.norm(a_np) * np.linalg.norm(b_np))
+def retrieve(
+	query: str,
+	k: int = 10,
+	rescore: int = RESCORE_FACTOR,
+	filters: Optional[Dict[str, Any]] = None,
+) -> List[Document]:
+	"""Top-k chunks across shards.
 
-
-def retrieve(query: str, k: int = 10) -> List[Document]:
-	# Load chunks from JSON file
-	chunks_file = VECTOR_DIR / "chunks.json"
-	if not chunks_file.exists():
+	`filters` (source, doc_type, pages, ingested_after, ingested_before) are
+	matched against the shard index so non-matching shards are never loaded.
+	"""
+	shard_ids = select_shards(load_index(VECTOR_DIR), filters)
+	if not shard_ids:
 		return []
 	
-	with open(chunks_file, "r", encoding="utf-8") as f:
-		chunk_data = json.load(f)
-	
 	# Get query embedding
 	embeddings = _embeddings()
 	query_embedding = embeddings.embed_query(query)
 	
-	# Calculate similarities
-	similarities = []
-	for chunk in chunk_data:
-		similarity = cosine_similarity(query_embedding, chunk["embedding"])
-		similarities.append((similarity, chunk))
+	# Score each shard's (possibly quantized) matrix, optionally rescoring a shortlist exactly
+	hits = []
+	for shard_id in shard_ids:
+		store = load_store(shard_dir(VECTOR_DIR, shard_id))
+		if store is None:
+			continue
+		for score, row in store.search(query_embedding, k, rescore=rescore):
+			hits.append((score, store.chunks[row]))
 	
-	# Sort by similarity and get top k
-	similarities.sort(key=lambda x: x[0], reverse=True)
-	top_chunks = similarities[:k]
+	# Merge per-shard results and keep the global top k
+	hits.sort(key=lambda x: x[0], reverse=True)
 	
 	# Convert to Document objects
 	documents = []
-	for _, chunk in top_chunks:
+	for _, chunk in hits[:k]:
 		doc = Document(
 			page_content=chunk["text"],
 			metadata=chunk["metadata"]
@@ -58,5 +57,3 @@ def retrieve(query: str, k: int = 10) -> List[Document]:
 
 
 __all__ = ["retrieve"]
-
-
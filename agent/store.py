@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import json
+import shutil
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+DTYPES = ("float32", "float16", "int8")
+# Rows upcast to float32 at a time while scoring a compressed matrix
+SCORE_BLOCK_ROWS = 4096
+
+CHUNKS_FILE = "chunks.json"
+MANIFEST_FILE = "manifest.json"
+CODES_FILE = "embeddings.npy"
+SCALES_FILE = "scales.npy"
+FULL_FILE = "embeddings_full.npy"
+
+SHARDS_DIR = "shards"
+INDEX_FILE = "index.json"
+FILTER_KEYS = ("source", "doc_type", "pages", "ingested_after", "ingested_before")
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+	"""L2-normalize rows so cosine similarity becomes a plain dot product"""
+	matrix = np.asarray(matrix, dtype=np.float32)
+	norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+	norms[norms == 0] = 1.0
+	return matrix / norms
+
+
+def check_dtype(dtype: str) -> None:
+	if dtype not in DTYPES:
+		raise ValueError(f"Unsupported embedding dtype: {dtype} (expected one of {', '.join(DTYPES)})")
+
+
+def quantize(matrix: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+	"""Compress a float32 matrix into `dtype`.
+
+	int8 uses symmetric per-row scales, so a row is recovered as codes * scale.
+	"""
+	check_dtype(dtype)
+	if dtype == "float32":
+		return matrix.astype(np.float32), None
+	if dtype == "float16":
+		return matrix.astype(np.float16), None
+	if dtype == "int8":
+		scales = np.abs(matrix).max(axis=1) / 127.0
+		scales[scales == 0] = 1.0
+		codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+		return codes, scales.astype(np.float32)
+
+
+def _top_indices(scores: np.ndarray, n: int) -> np.ndarray:
+	if n >= len(scores):
+		return np.argsort(-scores)
+	part = np.argpartition(-scores, n)[:n]
+	return part[np.argsort(-scores[part])]
+
+
+@dataclass
+class VectorStore:
+	codes: np.ndarray
+	chunks: List[Dict[str, Any]] = field(default_factory=list)
+	scales: Optional[np.ndarray] = None
+	# Full-precision rows for rescoring; memory-mapped so they stay on disk
+	full: Optional[np.ndarray] = None
+
+	@property
+	def dtype(self) -> str:
+		return str(self.codes.dtype)
+
+	@property
+	def nbytes(self) -> int:
+		"""Resident size of the matrix used for scoring"""
+		return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+	def scores(self, query: np.ndarray) -> np.ndarray:
+		"""Approximate cosine scores computed against the compressed matrix.
+
+		Rows are upcast in blocks of SCORE_BLOCK_ROWS, so scoring never holds a
+		float32 copy of the whole matrix.
+		"""
+		query = np.asarray(query, dtype=np.float32)
+		scores = np.empty(len(self.codes), dtype=np.float32)
+		for start in range(0, len(self.codes), SCORE_BLOCK_ROWS):
+			block = self.codes[start:start + SCORE_BLOCK_ROWS]
+			scores[start:start + len(block)] = block.astype(np.float32, copy=False) @ query
+		if self.scales is not None:
+			scores *= self.scales
+		return scores
+
+	def search(self, query: Sequence[float], k: int, rescore: int = 0) -> List[Tuple[float, int]]:
+		"""Return (score, row) pairs for the top-k rows.
+
+		With `rescore` > 0 and full-precision rows available, a shortlist of
+		k * rescore candidates is re-ranked with exact float32 scores.
+		"""
+		if len(self.codes) == 0 or k <= 0:
+			return []
+		q = normalize(query)
+		scores = self.scores(q)
+		if rescore > 0 and self.full is not None and self.dtype != "float32":
+			# Sorted rows keep reads from the memory-mapped file sequential
+			rows = np.sort(_top_indices(scores, k * rescore))
+			exact = np.asarray(self.full[rows] @ q, dtype=np.float32)
+			order = np.argsort(-exact)[:k]
+			return [(float(exact[i]), int(rows[i])) for i in order]
+		return [(float(scores[i]), int(i)) for i in _top_indices(scores, k)]
+
+
+def save_store(directory: Path, chunks: List[Dict[str, Any]], embeddings: Sequence[Sequence[float]], dtype: str, keep_full: bool = True) -> None:
+	"""Write chunk texts/metadata as JSON and embeddings as a (compressed) .npy matrix"""
+	matrix = normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(chunks), -1))
+	codes, scales = quantize(matrix, dtype)
+
+	directory.mkdir(parents=True, exist_ok=True)
+	np.save(directory / CODES_FILE, codes)
+	if scales is not None:
+		np.save(directory / SCALES_FILE, scales)
+	else:
+		(directory / SCALES_FILE).unlink(missing_ok=True)
+	if keep_full and dtype != "float32":
+		np.save(directory / FULL_FILE, matrix)
+	else:
+		(directory / FULL_FILE).unlink(missing_ok=True)
+
+	with open(directory / CHUNKS_FILE, "w", encoding="utf-8") as f:
+		json.dump(chunks, f, indent=2, ensure_ascii=False)
+	with open(directory / MANIFEST_FILE, "w", encoding="utf-8") as f:
+		json.dump({"dtype": dtype, "count": len(chunks), "dim": int(matrix.shape[1])}, f, indent=2)
+
+
+def load_store(directory: Path) -> Optional[VectorStore]:
+	chunks_file = directory / CHUNKS_FILE
+	if not chunks_file.exists():
+		return None
+
+	with open(chunks_file, "r", encoding="utf-8") as f:
+		chunks = json.load(f)
+
+	codes = np.load(directory / CODES_FILE)
+	scales = np.load(directory / SCALES_FILE) if (directory / SCALES_FILE).exists() else None
+	full = np.load(directory / FULL_FILE, mmap_mode="r") if (directory / FULL_FILE).exists() else None
+	return VectorStore(chunks=chunks, codes=codes, scales=scales, full=full)
+
+
+# --- Sharded store: one store per source document plus a metadata index ---
+def shard_dir(root: Path, shard_id: str) -> Path:
+	return root / SHARDS_DIR / shard_id
+
+
+def load_index(root: Path) -> Dict[str, Dict[str, Any]]:
+	path = root / INDEX_FILE
+	if not path.exists():
+		return {}
+	with open(path, "r", encoding="utf-8") as f:
+		return json.load(f)
+
+
+def _save_index(root: Path, index: Dict[str, Dict[str, Any]]) -> None:
+	root.mkdir(parents=True, exist_ok=True)
+	with open(root / INDEX_FILE, "w", encoding="utf-8") as f:
+		json.dump(index, f, indent=2, ensure_ascii=False)
+
+
+def save_shard(root: Path, shard_id: str, chunks: List[Dict[str, Any]], embeddings: Sequence[Sequence[float]], dtype: str, metadata: Dict[str, Any], keep_full: bool = True) -> None:
+	"""Write one shard and record its metadata; other shards are left untouched"""
+	save_store(shard_dir(root, shard_id), chunks, embeddings, dtype, keep_full=keep_full)
+	index = load_index(root)
+	index[shard_id] = {**metadata, "chunks": len(chunks)}
+	_save_index(root, index)
+
+
+def shard_is_current(root: Path, shard_id: str, dtype: str, keep_full: bool) -> bool:
+	"""Whether a shard's stored matrices already match the dtype/rescoring settings"""
+	directory = shard_dir(root, shard_id)
+	try:
+		with open(directory / MANIFEST_FILE, "r", encoding="utf-8") as f:
+			stored = json.load(f)["dtype"]
+	except (FileNotFoundError, KeyError):
+		return False
+	return stored == dtype and (directory / FULL_FILE).exists() == (keep_full and dtype != "float32")
+
+
+def requantize_shard(root: Path, shard_id: str, dtype: str, keep_full: bool = True) -> bool:
+	"""Rewrite a shard in `dtype` from its full-precision rows, without re-embedding.
+
+	Returns False when the shard has no float32 copy to quantize from.
+	"""
+	store = load_store(shard_dir(root, shard_id))
+	if store is None:
+		return False
+	if store.full is not None:
+		source = store.full
+	elif store.dtype == "float32":
+		source = store.codes
+	else:
+		return False
+	# Copy out of the memory map before the file is rewritten
+	chunks = store.chunks
+	matrix = np.array(source, dtype=np.float32)
+	del store, source
+	save_store(shard_dir(root, shard_id), chunks, matrix, dtype, keep_full=keep_full)
+	return True
+
+
+def remove_shard(root: Path, shard_id: str) -> None:
+	shutil.rmtree(shard_dir(root, shard_id), ignore_errors=True)
+	index = load_index(root)
+	if index.pop(shard_id, None) is not None:
+		_save_index(root, index)
+
+
+def remove_flat_store(root: Path) -> None:
+	"""Delete a pre-shard store written directly into `root`; it is no longer read"""
+	for name in (CHUNKS_FILE, MANIFEST_FILE, CODES_FILE, SCALES_FILE, FULL_FILE):
+		(root / name).unlink(missing_ok=True)
+
+
+def _as_set(key: str, value: Any) -> set:
+	values = {value} if isinstance(value, str) else value
+	if not isinstance(values, (list, tuple, set, frozenset)) or not all(isinstance(v, str) for v in values):
+		raise ValueError(f"Filter '{key}' expects a string or a list of strings, got {value!r}")
+	return set(values)
+
+
+def _page_range(value: Any) -> Tuple[int, int]:
+	if isinstance(value, int) and not isinstance(value, bool):
+		return value, value
+	if isinstance(value, (list, tuple)) and len(value) == 2 and all(isinstance(v, int) and not isinstance(v, bool) for v in value):
+		return value[0], value[1]
+	raise ValueError(f"Filter 'pages' expects a page number or a (first, last) pair, got {value!r}")
+
+
+def _iso_date(key: str, value: Any) -> str:
+	# ingested_at is a UTC timestamp, so datetimes are compared in UTC as well
+	if isinstance(value, datetime):
+		if value.tzinfo is None:
+			raise ValueError(f"Filter '{key}' needs a timezone-aware datetime, got naive {value!r}")
+		return value.astimezone(timezone.utc).isoformat(timespec="seconds")
+	if isinstance(value, date):
+		return value.isoformat()
+	if isinstance(value, str):
+		return value
+	raise ValueError(f"Filter '{key}' expects an ISO date string or a date, got {value!r}")
+
+
+def check_filters(filters: Dict[str, Any]) -> Dict[str, Any]:
+	"""Validate retrieval filters and normalize their values.
+
+	- source: file name(s), relative path or basename
+	- doc_type: doc type(s)
+	- pages: page number or (first, last) range that must overlap the shard's page range
+	- ingested_after / ingested_before: ISO date strings, dates or timezone-aware
+	  datetimes (converted to UTC), compared against the UTC ingest time
+	"""
+	unknown = set(filters) - set(FILTER_KEYS)
+	if unknown:
+		raise ValueError(f"Unknown retrieval filter(s): {', '.join(sorted(unknown))}")
+
+	checked: Dict[str, Any] = {}
+	for key in ("source", "doc_type"):
+		if key in filters:
+			checked[key] = _as_set(key, filters[key])
+	if "pages" in filters:
+		checked["pages"] = _page_range(filters["pages"])
+	for key in ("ingested_after", "ingested_before"):
+		if key in filters:
+			checked[key] = _iso_date(key, filters[key])
+	return checked
+
+
+def shard_matches(metadata: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+	"""Check shard metadata against filters already normalized by check_filters"""
+	source = metadata.get("source", "")
+	if "source" in filters and not filters["source"] & {source, Path(source).name}:
+		return False
+	if "doc_type" in filters and metadata.get("doc_type") not in filters["doc_type"]:
+		return False
+	if "pages" in filters:
+		pages = metadata.get("pages")
+		first, last = filters["pages"]
+		if not pages or pages[1] < first or pages[0] > last:
+			return False
+	ingested_at = metadata.get("ingested_at", "")
+	if "ingested_after" in filters and ingested_at < filters["ingested_after"]:
+		return False
+	if "ingested_before" in filters and ingested_at >= filters["ingested_before"]:
+		return False
+	return True
+
+
+def select_shards(index: Dict[str, Dict[str, Any]], filters: Optional[Dict[str, Any]] = None) -> List[str]:
+	checked = check_filters(filters or {})
+	if not checked:
+		return list(index)
+	return [shard_id for shard_id, metadata in index.items() if shard_matches(metadata, checked)]
+
+
+__all__ = [
+	"VectorStore",
+	"save_store",
+	"load_store",
+	"quantize",
+	"normalize",
+	"DTYPES",
+	"check_dtype",
+	"shard_dir",
+	"load_index",
+	"save_shard",
+	"shard_is_current",
+	"requantize_shard",
+	"remove_shard",
+	"remove_flat_store",
+	"check_filters",
+	"select_shards",
+]
@@ -1,11 +1,13 @@
 import streamlit as st
-import os
 import asyncio
+import uuid
 from typing import Dict, Any
 
 from agent.graph import build_graph
-from agent.ingest import ingest_pdf_to_chroma
-from agent.config import DOC_PATH
+from agent.ingest import ingest_corpus
+from agent.config import CHAT_WINDOW_TURNS, DOC_PATH, VECTOR_DIR
+from agent.history import clear_spill, history_window, load_metadata, prune_spill, store_metadata, touch_spill
+from agent.store import load_index
 
 try:
     asyncio.get_running_loop()
@@ -67,30 +69,47 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 if "graph" not in st.session_state:
     st.session_state.graph = None
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+    # New session: clean up spill files of sessions that were never cleared
+    prune_spill(keep=st.session_state.session_id)
+# Heartbeat so other sessions' pruning leaves this one's spill files alone
+touch_spill(st.session_state.session_id)
+if "window_turns" not in st.session_state:
+    st.session_state.window_turns = CHAT_WINDOW_TURNS
 
 # Sidebar for settings and ingestion
 with st.sidebar:
     st.title("🍷 Wine Concierge")
     
     # Check if vector store exists
-    vector_exists = os.path.exists(".vectorstore/chunks.json")
+    shard_index = load_index(VECTOR_DIR)
+    vector_exists = bool(shard_index)
     
     if not vector_exists:
-        st.warning("⚠️ PDF not ingested yet!")
-        if st.button("📄 Ingest PDF", type="primary"):
-            with st.spinner("Ingesting PDF..."):
+        st.warning("⚠️ Documents not ingested yet!")
+        if st.button("📄 Ingest documents", type="primary"):
+            with st.spinner("Ingesting documents..."):
                 try:
-                    result = ingest_pdf_to_chroma()
+                    result = ingest_corpus()
                     st.success(result)
                     st.rerun()
                 except Exception as e:
                     st.error(f"Error: {e}")
     else:
-        st.success("✅ PDF ingested")
-        if st.button("🔄 Re-ingest PDF"):
-            with st.spinner("Re-ingesting PDF..."):
+        st.success(f"✅ {len(shard_index)} document(s) ingested")
+        if st.button("➕ Ingest new/changed documents"):
+            with st.spinner("Updating documents..."):
                 try:
-                    result = ingest_pdf_to_chroma()
+                    result = ingest_corpus()
+                    st.success(result)
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Error: {e}")
+        if st.button("🔄 Re-ingest all documents"):
+            with st.spinner("Re-ingesting documents..."):
+                try:
+                    result = ingest_corpus(force=True)
                     st.success(result)
                     st.rerun()
                 except Exception as e:
@@ -107,6 +126,8 @@ with st.sidebar:
     # Clear chat
     if st.button("🗑️ Clear Chat"):
         st.session_state.messages = []
+        st.session_state.window_turns = CHAT_WINDOW_TURNS
+        clear_spill(st.session_state.session_id)
         st.rerun()
 
 # Main chat interface with weather in top right
@@ -139,27 +160,42 @@ if st.session_state.graph is None and vector_exists:
         except Exception as e:
             st.error(f"Failed to initialize agent: {e}")
 
-for message in st.session_state.messages:
+def render_details(metadata: Dict[str, Any] | None) -> None:
+    if metadata is None:
+        st.info("⌛ Details expired: they were removed from disk to free space.")
+        return
+    
+    if "citations" in metadata:
+        st.write("**Sources:**")
+        for i, citation in enumerate(metadata["citations"], 1):
+            st.write(f"[{i}] {citation}")
+    
+    if "links" in metadata:
+        st.write("**Web Search Results:**")
+        for i, link in enumerate(metadata["links"], 1):
+            with st.expander(f"[{i}] {link['title']}"):
+                st.write(f"**URL:** [{link['url']}]({link['url']})")
+                st.write(f"**Summary:** {link['snippet']}")
+    
+    if "raw" in metadata:
+        st.json(metadata["raw"])
+
+
+# Only the last `window_turns` turns are rendered; older ones load on demand
+start = history_window(st.session_state.messages, st.session_state.window_turns)
+if start > 0:
+    if st.button(f"⬆️ Load older messages ({start} hidden)"):
+        st.session_state.window_turns += CHAT_WINDOW_TURNS
+        st.rerun()
+
+for index, message in enumerate(st.session_state.messages[start:], start):
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
         
-        # Show additional info if available
-        if "metadata" in message:
-            with st.expander("📋 Details"):
-                if "citations" in message["metadata"]:
-                    st.write("**Sources:**")
-                    for i, citation in enumerate(message["metadata"]["citations"], 1):
-                        st.write(f"[{i}] {citation}")
-                
-                if "links" in message["metadata"]:
-                    st.write("**Web Search Results:**")
-                    for i, link in enumerate(message["metadata"]["links"], 1):
-                        with st.expander(f"[{i}] {link['title']}"):
-                            st.write(f"**URL:** [{link['url']}]({link['url']})")
-                            st.write(f"**Summary:** {link['snippet']}")
-                
-                if "raw" in message["metadata"]:
-                    st.json(message["metadata"]["raw"])
+        # Details are only built (and spilled metadata only read) when toggled open
+        if message.get("metadata"):
+            if st.toggle("📋 Details", key=f"details_{index}"):
+                render_details(load_metadata(message["metadata"]))
 
 if prompt := st.chat_input("Ask me anything about our wine business..."):
     st.session_state.messages.append({"role": "user", "content": prompt})
@@ -168,7 +204,7 @@ if prompt := st.chat_input("Ask me anything about our wine business..."):
         st.markdown(prompt)
     
     if st.session_state.graph is None:
-        st.error("Agent not initialized. Please ingest the PDF first.")
+        st.error("Agent not initialized. Please ingest the documents first.")
     else:
         with st.chat_message("assistant"):
             with st.spinner("Thinking..."):
@@ -197,7 +233,7 @@ if prompt := st.chat_input("Ask me anything about our wine business..."):
                     st.session_state.messages.append({
                         "role": "assistant", 
                         "content": answer,
-                        "metadata": metadata
+                        "metadata": store_metadata(metadata, st.session_state.session_id)
                     })
                     
                 except Exception as e:
@@ -3,14 +3,19 @@ from __future__ import annotations
 import os
 from typing import Dict
 
-from agent.ingest import ingest_pdf_to_chroma
+from agent.bench import benchmark_quantization, format_report
+from agent.ingest import ingest_corpus
 from agent.graph import build_graph
 
 
 def main():
 	mode = os.getenv("MODE", "chat")
 	if mode == "ingest":
-		print(ingest_pdf_to_chroma())
+		print(ingest_corpus(force=os.getenv("FORCE", "") == "1"))
+		return
+	if mode == "bench":
+		k = int(os.getenv("BENCH_K", "10"))
+		print(format_report(benchmark_quantization(k=k), k=k))
 		return
 
 	graph = build_graph()